@@ -0,0 +1,381 @@
+"""Reproducible benchmarks for the similarity and taste-merge pipeline.
+
+Run from the repository root:
+
+    python benchmarks/bench_matchmaking.py                     # 1k, 10k and 100k users
+    python benchmarks/bench_matchmaking.py --sizes 1000 --output before.json
+    python benchmarks/bench_matchmaking.py --compare before.json
+
+Profiles are synthetic but shaped like real ones: artists and genres are drawn from a
+Zipf distribution over a fixed vocabulary, genres and decades follow from the chosen
+artists, and audio features cluster around a per-genre centroid. The same --seed always
+produces the same population, so runs on different commits are comparable.
+
+Each case reports throughput, p50/p99 latency and the tracemalloc peak of a separate
+memory pass (timing runs with tracemalloc off). Results go to a JSON file stamped with
+the git commit. No Supabase calls are made: _ranked_similar_users is measured through
+the NeighborIndex work it does per request (cold list materialization and warm reads).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds its Supabase client at import time; the client is never used here.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark-placeholder-key")
+
+import numpy as np  # noqa: E402
+
+import app as pulse  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+PAIR_OPS = 20000
+PROBE_OPS = 200
+UPDATE_OPS = 200
+
+# ============================================================
+# SYNTHETIC PROFILES
+# ============================================================
+
+# genre -> (decades, audio centroid: energy, danceability, valence, acousticness)
+GENRES = {
+    "pop": (["2010s", "2020s"], (0.68, 0.70, 0.60, 0.18)),
+    "dance pop": (["2010s", "2020s"], (0.74, 0.76, 0.62, 0.12)),
+    "hip hop": (["2000s", "2010s", "2020s"], (0.66, 0.78, 0.50, 0.14)),
+    "rap": (["2010s", "2020s"], (0.68, 0.80, 0.46, 0.12)),
+    "trap": (["2010s", "2020s"], (0.70, 0.79, 0.38, 0.10)),
+    "r&b": (["1990s", "2000s", "2010s"], (0.55, 0.70, 0.52, 0.28)),
+    "neo soul": (["1990s", "2000s"], (0.46, 0.64, 0.55, 0.40)),
+    "rock": (["1970s", "1980s", "1990s"], (0.80, 0.48, 0.50, 0.10)),
+    "classic rock": (["1960s", "1970s"], (0.72, 0.50, 0.58, 0.20)),
+    "alternative rock": (["1990s", "2000s"], (0.78, 0.45, 0.40, 0.08)),
+    "indie": (["2000s", "2010s"], (0.58, 0.55, 0.45, 0.35)),
+    "indie pop": (["2010s", "2020s"], (0.60, 0.62, 0.55, 0.30)),
+    "indie folk": (["2000s", "2010s"], (0.38, 0.48, 0.42, 0.72)),
+    "folk": (["1960s", "1970s"], (0.32, 0.46, 0.45, 0.80)),
+    "singer-songwriter": (["1970s", "2010s"], (0.36, 0.50, 0.40, 0.70)),
+    "electronic": (["2000s", "2010s"], (0.82, 0.68, 0.40, 0.05)),
+    "house": (["1990s", "2010s"], (0.84, 0.80, 0.58, 0.04)),
+    "techno": (["1990s", "2010s"], (0.88, 0.72, 0.30, 0.03)),
+    "edm": (["2010s"], (0.90, 0.70, 0.45, 0.03)),
+    "ambient": (["1990s", "2010s"], (0.20, 0.30, 0.25, 0.85)),
+    "jazz": (["1950s", "1960s"], (0.38, 0.52, 0.50, 0.75)),
+    "soul": (["1960s", "1970s"], (0.55, 0.65, 0.70, 0.40)),
+    "funk": (["1970s"], (0.72, 0.82, 0.78, 0.20)),
+    "disco": (["1970s"], (0.76, 0.84, 0.80, 0.15)),
+    "metal": (["1980s", "2000s"], (0.94, 0.40, 0.30, 0.02)),
+    "punk": (["1970s", "1990s"], (0.92, 0.45, 0.52, 0.04)),
+    "country": (["1990s", "2010s"], (0.62, 0.58, 0.62, 0.32)),
+    "latin": (["2010s", "2020s"], (0.74, 0.80, 0.72, 0.18)),
+    "reggaeton": (["2010s", "2020s"], (0.76, 0.84, 0.70, 0.14)),
+    "k-pop": (["2010s", "2020s"], (0.80, 0.72, 0.64, 0.10)),
+    "afrobeats": (["2010s", "2020s"], (0.70, 0.82, 0.74, 0.20)),
+    "classical": (["1800s", "1900s"], (0.18, 0.25, 0.30, 0.92)),
+    "lo-fi": (["2010s", "2020s"], (0.30, 0.62, 0.42, 0.60)),
+    "shoegaze": (["1990s"], (0.70, 0.35, 0.30, 0.15)),
+    "grunge": (["1990s"], (0.82, 0.42, 0.32, 0.06)),
+}
+
+ARTIST_WORDS = (
+    "Arctic", "Velvet", "Neon", "Golden", "Silver", "Midnight", "Electric", "Paper", "Crystal",
+    "Wild", "Young", "Black", "Blue", "Red", "Lunar", "Solar", "Glass", "Echo", "Static", "Honey",
+    "Violet", "Ghost", "Ocean", "Desert", "Canyon", "River", "Saint", "Royal", "Broken", "Hollow",
+)
+ARTIST_NOUNS = (
+    "Monkeys", "Lights", "Tigers", "Kids", "Wolves", "Hearts", "Machines", "Parade", "Club",
+    "Collective", "Brothers", "Sisters", "Dreams", "Riot", "Season", "Motel", "Garden", "Parlour",
+    "Radio", "Frequency", "Coast", "Empire", "Theory", "Ritual", "Avenue", "Atlas",
+)
+TRACK_WORDS = (
+    "Love", "Night", "Fire", "Gold", "Stay", "Run", "Falling", "Summer", "Home", "Forever",
+    "Dreams", "Lights", "Heart", "Dance", "Rain", "Ghost", "Wild", "Alone", "Again", "Tonight",
+)
+
+
+def _zipf_cum_weights(n: int, s: float = 1.07) -> list:
+    total = 0.0
+    out = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** s
+        out.append(total)
+    return out
+
+
+class ProfileGenerator:
+    """Deterministic source of taste_profile dicts and raw quiz/Spotify payloads."""
+
+    def __init__(self, seed: int = 7, artists: int = 20000):
+        self.rng = random.Random(seed)
+        genres = list(GENRES)
+        self.genre_cum = _zipf_cum_weights(len(genres), 0.9)
+        self.genres = genres
+        names = set()
+        while len(names) < artists:
+            first = self.rng.choice(ARTIST_WORDS)
+            second = self.rng.choice(ARTIST_NOUNS)
+            style = self.rng.random()
+            if style < 0.4:
+                name = f"The {first} {second}"
+            elif style < 0.7:
+                name = f"{first} {second}"
+            else:
+                name = f"{first} {second} {self.rng.randint(1, 999)}"
+            names.add(name)
+        self.artists = sorted(names)
+        self.rng.shuffle(self.artists)
+        self.artist_cum = _zipf_cum_weights(len(self.artists))
+        # Every artist belongs to one to three genres, skewed toward the popular ones.
+        self.artist_genres = {
+            name: sorted(set(self.rng.choices(genres, cum_weights=self.genre_cum, k=self.rng.randint(1, 3))))
+            for name in self.artists
+        }
+
+    def _tracks(self, artist: str, count: int) -> list:
+        return [f"{artist} - {self.rng.choice(TRACK_WORDS)} {self.rng.choice(TRACK_WORDS)}" for _ in range(count)]
+
+    def _audio(self, genres: list) -> dict:
+        centroid = [0.0, 0.0, 0.0, 0.0]
+        for genre in genres:
+            for i, v in enumerate(GENRES[genre][1]):
+                centroid[i] += v / len(genres)
+        return {
+            key: round(min(1.0, max(0.0, self.rng.gauss(centroid[i], 0.08))), 4)
+            for i, key in enumerate(pulse.AUDIO_FEATURE_KEYS)
+        }
+
+    def taste_profile(self) -> dict:
+        rng = self.rng
+        artists = list(dict.fromkeys(rng.choices(self.artists, cum_weights=self.artist_cum, k=rng.randint(5, 40))))
+        genres = list(dict.fromkeys(g for a in artists for g in self.artist_genres[a]))[:30]
+        tracks = []
+        for artist in artists[:20]:
+            tracks.extend(self._tracks(artist, rng.randint(1, 3)))
+        decades = list(dict.fromkeys(d for g in genres for d in GENRES[g][0]))
+        return {
+            "topArtists": artists[:40],
+            "topGenres": genres,
+            "topTracks": tracks[:40],
+            "listeningHistory": [],
+            "favoriteDecades": decades,
+            "audioFeatures": self._audio(genres[:5] or ["pop"]),
+        }
+
+    def quiz_answers(self) -> dict:
+        rng = self.rng
+        return {
+            "favorite_genre": rng.choice(list(pulse.GENRE_SLUG_LABEL)),
+            "listening_frequency": rng.choice(["daily", "regular", "weekly", "occasional"]),
+            "concert_frequency": rng.choice(["monthly", "occasional", "rarely", "never"]),
+            "music_discovery": rng.choice(["radio", "streaming", "friends"]),
+            "matchmaking_priority": rng.choice(["music", "location", "both"]),
+            "spotify_integration": rng.choice(["yes", "no"]),
+        }
+
+    def spotify_payload(self) -> dict:
+        taste = self.taste_profile()
+        return {
+            "top_artists": [{"name": a, "id": f"sp{i}"} for i, a in enumerate(taste["topArtists"])],
+            "top_genres": taste["topGenres"],
+            "top_tracks": [{"name": t} for t in taste["topTracks"]],
+            "audio_features": taste["audioFeatures"],
+        }
+
+
+# ============================================================
+# HARNESS
+# ============================================================
+
+def _percentile(sorted_ns: list, pct: float) -> float:
+    if not sorted_ns:
+        return 0.0
+    idx = min(len(sorted_ns) - 1, max(0, int(round(pct / 100.0 * (len(sorted_ns) - 1)))))
+    return sorted_ns[idx]
+
+
+def run_case(name: str, size: int, setup, op, ops: int, memory_ops: int = 200) -> dict:
+    """Time ops calls of op(state, i), then re-run a short pass under tracemalloc for peak memory."""
+    state = setup()
+    latencies = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for i in range(ops):
+        t0 = clock()
+        op(state, i)
+        latencies.append(clock() - t0)
+    elapsed = (clock() - started) / 1e9
+    latencies.sort()
+
+    state = setup()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(min(ops, memory_ops)):
+        op(state, i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "size": size,
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 2) if elapsed > 0 else None,
+        "p50_us": round(_percentile(latencies, 50) / 1e3, 3),
+        "p99_us": round(_percentile(latencies, 99) / 1e3, 3),
+        "peak_mem_bytes": max(0, peak - baseline),
+    }
+
+
+def build_cases(size: int, population: list, gen: ProfileGenerator, full_scan_probes: int) -> list:
+    """Return (name, setup, op, ops, memory_ops) tuples for one population size."""
+    rng = random.Random(size)
+    pairs = [(rng.randrange(size), rng.randrange(size)) for _ in range(PAIR_OPS)]
+    compact = [pulse.TasteProfile.from_dict(p) for p in population]
+    quizzes = [pulse.build_music_profile_from_quiz(gen.quiz_answers()) for _ in range(512)]
+    spotify = [pulse.taste_from_spotify_payload(gen.spotify_payload()) for _ in range(512)]
+    probes = [rng.randrange(size) for _ in range(PROBE_OPS)]
+    updates = [gen.taste_profile() for _ in range(UPDATE_OPS)]
+    k = int(os.getenv("PULSE_NEIGHBOR_K", "50"))
+    lsh_min = int(os.getenv("PULSE_LSH_MIN_USERS", "5000"))
+
+    def loaded_index():
+        index = pulse.NeighborIndex(k=k, lsh_min_users=lsh_min)
+        index.load({i: p for i, p in enumerate(compact)})
+        return index
+
+    def warm_index():
+        index = loaded_index()
+        for key in probes:
+            index.neighbors(key)
+        return index
+
+    shared = {}
+
+    def shared_index():
+        # Reuse one cold index per size for the read-only cases; loading 100k rows is slow.
+        if "index" not in shared:
+            shared["index"] = loaded_index()
+        index = shared["index"]
+        index._neighbors = {}
+        index._listed_in = {}
+        return index
+
+    def pair_op(fn, field=None):
+        if field is None:
+            return lambda _, i: fn(population[pairs[i][0]], population[pairs[i][1]])
+        return lambda _, i: fn(population[pairs[i][0]].get(field), population[pairs[i][1]].get(field))
+
+    def full_scan(_, i):
+        probe = population[probes[i]]
+        scored = [(pulse.similarity_between_profiles(probe, other), j) for j, other in enumerate(population)]
+        scored.sort(key=lambda p: -p[0])
+        return scored[:k]
+
+    return [
+        ("jaccard_list[artists]", lambda: None, pair_op(pulse._jaccard_list, "topArtists"), PAIR_OPS, 200),
+        ("audio_cosine", lambda: None, pair_op(pulse._audio_cosine, "audioFeatures"), PAIR_OPS, 200),
+        ("similarity_between_profiles[dict]", lambda: None, pair_op(pulse.similarity_between_profiles),
+         PAIR_OPS, 200),
+        ("similarity_between_profiles[TasteProfile]", lambda: None,
+         lambda _, i: pulse.similarity_between_profiles(compact[pairs[i][0]], compact[pairs[i][1]]), PAIR_OPS, 200),
+        ("taste_profile_from_dict", lambda: None, lambda _, i: pulse.TasteProfile.from_dict(population[i % size]),
+         PAIR_OPS, 200),
+        ("merge_quiz_into_taste", lambda: None,
+         lambda _, i: pulse.merge_quiz_into_taste(population[i % size], quizzes[i % len(quizzes)]), PAIR_OPS, 200),
+        ("merge_spotify_into_taste", lambda: None,
+         lambda _, i: pulse.merge_spotify_into_taste(population[i % size], spotify[i % len(spotify)]), PAIR_OPS, 200),
+        ("neighbor_index_load", lambda: None, lambda _, i: loaded_index(), 1, 1),
+        ("ranked_similar_users[cold]", shared_index, lambda index, i: index.neighbors(probes[i]), PROBE_OPS, 50),
+        ("ranked_similar_users[warm]", warm_index, lambda index, i: index.neighbors(probes[i]), PROBE_OPS, 50),
+        ("vibe_neighbors[nearest]", shared_index,
+         lambda index, i: index.vibe_neighbors(compact[probes[i]], 20, exclude={probes[i]}), PROBE_OPS, 50),
+        ("vibe_neighbors[min_similarity=0.99]", shared_index,
+         lambda index, i: index.vibe_neighbors(compact[probes[i]], 20, min_similarity=0.99, exclude={probes[i]}),
+         PROBE_OPS, 50),
+        ("neighbor_index_update", warm_index, lambda index, i: index.update(probes[i], updates[i]), UPDATE_OPS, 50),
+        ("ranked_similar_users[pairwise_scan]", lambda: None, full_scan, full_scan_probes, 1),
+    ]
+
+
+def git_commit() -> dict:
+    def run(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+        except Exception:
+            return ""
+    return {"commit": run("rev-parse", "HEAD") or None, "dirty": bool(run("status", "--porcelain", "--", "app.py"))}
+
+
+def compare(results: list, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {(r["case"], r["size"]): r for r in json.load(f).get("results", [])}
+    print(f"\nvs {baseline_path}")
+    for r in results:
+        old = baseline.get((r["case"], r["size"]))
+        if not old or not old.get("ops_per_sec") or not r.get("ops_per_sec"):
+            continue
+        speedup = r["ops_per_sec"] / old["ops_per_sec"]
+        print(f"  {r['case']:<42} {r['size']:>7}  {speedup:6.2f}x throughput  "
+              f"p99 {old['p99_us']:.1f} -> {r['p99_us']:.1f} us")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated user counts (default: 1000,10000,100000)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--cases", default="", help="comma-separated substrings; only matching cases run")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_results.json"))
+    parser.add_argument("--compare", default="", help="earlier results file to print speedups against")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    wanted = [c.strip() for c in args.cases.split(",") if c.strip()]
+    results = []
+    for size in sizes:
+        gen = ProfileGenerator(seed=args.seed)
+        population = [gen.taste_profile() for _ in range(size)]
+        # The quadratic-era baseline costs O(n) per probe, so fewer probes at larger sizes.
+        full_scan_probes = max(1, min(PROBE_OPS, 20_000_000 // (size * 100)))
+        for name, setup, op, ops, memory_ops in build_cases(size, population, gen, full_scan_probes):
+            if wanted and not any(w in name for w in wanted):
+                continue
+            row = run_case(name, size, setup, op, ops, memory_ops)
+            results.append(row)
+            print(f"{name:<42} {size:>7}  {row['ops_per_sec'] or 0:>12.1f} ops/s  "
+                  f"p50 {row['p50_us']:>10.1f} us  p99 {row['p99_us']:>10.1f} us  "
+                  f"peak {row['peak_mem_bytes'] / 1024:>9.1f} KiB", flush=True)
+
+    payload = {
+        "meta": {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nwrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
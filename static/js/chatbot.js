@@ -1,4 +1,4 @@
-// Pulse assistant maps keywords to app routes and to curated events embedded at render time.
+// Pulse assistant maps keywords to app routes and to curated events resolved by the server.
 // Responses stay rule based while action rows deep link into matchmaking, settings, and event modals.
 
 const chatState = {
@@ -10,15 +10,17 @@ const chatState = {
   }
 };
 
-// Reads the JSON script tag emitted by Flask so term lists stay aligned with the events catalog.
-function readPulseEventNav() {
-  const el = document.getElementById('pulse-event-nav');
-  if (!el) return [];
+const EMPTY_RESOLVED = { events: [], artists: [], genres: [], locations: [] };
+
+// Asks the server's term index which events, artists, genres and locations a message names,
+// so the catalog never has to be shipped to the browser.
+async function resolveMessage(message) {
   try {
-    const data = JSON.parse(el.textContent || '[]');
-    return Array.isArray(data) ? data : [];
+    const res = await fetch(`/api/assistant/resolve?q=${encodeURIComponent(message)}`);
+    if (!res.ok) return EMPTY_RESOLVED;
+    return { ...EMPTY_RESOLVED, ...(await res.json()) };
   } catch {
-    return [];
+    return EMPTY_RESOLVED;
   }
 }
 
@@ -26,7 +28,6 @@ document.addEventListener('DOMContentLoaded', () => {
   const chatInput = document.getElementById('chatInput');
   const sendButton = document.getElementById('sendButton');
   const chatMessages = document.getElementById('chatMessages');
-  const pulseNav = readPulseEventNav();
 
   if (!chatInput || !sendButton || !chatMessages) return;
 
@@ -41,13 +42,15 @@ document.addEventListener('DOMContentLoaded', () => {
   });
 
   // Appends the user line, derives intent, optionally overrides copy when actions carry navigation.
-  function handleSendMessage() {
+  async function handleSendMessage() {
     const messageText = chatInput.value.trim();
     if (!messageText) return;
 
     addMessageToChat(messageText, 'user');
+    chatInput.value = '';
 
-    const parsedMessage = parseMessage(messageText);
+    const resolved = await resolveMessage(messageText);
+    const parsedMessage = parseMessage(messageText, resolved);
     updateContext(parsedMessage);
 
     const actions = getSuggestedActions(parsedMessage);
@@ -67,8 +70,6 @@ document.addEventListener('DOMContentLoaded', () => {
     setTimeout(() => {
       addMessageToChat(response, 'bot', actions);
     }, 500);
-
-    chatInput.value = '';
   }
 
   // Builds message rows, attaches optional link buttons for bot replies, scrolls the transcript.
@@ -162,34 +163,20 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   ];
 
-  // Matches curated event terms against the lowercased message and returns deep links with open query params.
-  function pulseEventActions(lower) {
-    const out = [];
-    const seen = new Set();
-    for (const entry of pulseNav) {
-      const terms = entry.match_terms || [];
-      const hit = terms.some((t) => {
-        const s = String(t).toLowerCase();
-        if (s.length < 3) return false;
-        return lower.includes(s);
-      });
-      if (hit && entry.id && !seen.has(entry.id)) {
-        seen.add(entry.id);
-        out.push({
-          id: `pulse-event-${entry.id}`,
-          label: `Open ${entry.title}`,
-          href: `/events?open=${encodeURIComponent(entry.id)}`,
-          eventTitle: entry.title
-        });
-      }
-    }
-    return out;
+  // Turns the events the server matched (best first) into deep links with open query params.
+  function pulseEventActions(events) {
+    return events.map((entry) => ({
+      id: `pulse-event-${entry.id}`,
+      label: `Open ${entry.title}`,
+      href: entry.href || `/events?open=${encodeURIComponent(entry.id)}`,
+      eventTitle: entry.title
+    }));
   }
 
   // Prefers specific event buttons, adds generic CTAs when no listing matched, caps count for layout balance.
   function getSuggestedActions(parsedMessage) {
     const lower = parsedMessage.original.toLowerCase();
-    const pulseActions = pulseEventActions(lower);
+    const pulseActions = pulseEventActions(parsedMessage.events);
     const actions = [...pulseActions];
     const seen = new Set(actions.map((a) => a.id));
 
@@ -224,8 +211,8 @@ document.addEventListener('DOMContentLoaded', () => {
     return actions.slice(0, 5);
   }
 
-  // Scans intent vocabularies, records first hit as primary intent, collects light entity lists.
-  function parseMessage(message) {
+  // Scans intent vocabularies, records first hit as primary intent, takes entities from the server.
+  function parseMessage(message, resolved = EMPTY_RESOLVED) {
     const lowerMessage = message.toLowerCase();
 
     const intents = {
@@ -250,9 +237,9 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     const entities = {
-      artists: extractArtists(lowerMessage),
-      genres: extractGenres(lowerMessage),
-      locations: extractLocations(lowerMessage)
+      artists: resolved.artists,
+      genres: resolved.genres,
+      locations: resolved.locations
     };
 
     return {
@@ -260,28 +247,11 @@ document.addEventListener('DOMContentLoaded', () => {
       intent: detectedIntent || 'general',
       keywords,
       entities,
+      events: resolved.events,
       sentiment: analyzeSentiment(message)
     };
   }
 
-  // Small fixed artist list for highlighting names in free text during demos.
-  function extractArtists(message) {
-    const commonArtists = ['tyler the creator', 'drake', 'kendrick', 'taylor swift', 'ariana grande'];
-    return commonArtists.filter((artist) => message.includes(artist));
-  }
-
-  // Genre tokens align with onboarding slugs where possible for consistent copy.
-  function extractGenres(message) {
-    const genres = ['hip hop', 'rap', 'pop', 'rock', 'jazz', 'r&b', 'electronic', 'indie', 'country', 'classical'];
-    return genres.filter((genre) => message.includes(genre));
-  }
-
-  // Major city tokens support event and map oriented replies.
-  function extractLocations(message) {
-    const commonLocations = ['los angeles', 'new york', 'chicago', 'san francisco', 'miami'];
-    return commonLocations.filter((location) => message.includes(location));
-  }
-
   // Simple bag of word scoring for positive versus negative tone, used only for future extensions.
   function analyzeSentiment(message) {
     const positiveWords = ['love', 'like', 'great', 'awesome', 'amazing', 'best', 'good', 'excited'];
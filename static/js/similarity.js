@@ -161,17 +161,19 @@ const SimilarityEngine = {
     }
   },
 
-  // Pulls the matchmaking candidate list with embedded taste profiles for pairwise scoring.
+  // Pulls the bounded, ranked matchmaking candidate list (profile sent once per user).
   async getAllUsers() {
     try {
-      const res = await fetch('/api/matchmaking/candidate-profiles', { credentials: 'same-origin' });
+      const res = await fetch(
+        '/api/matchmaking/candidate-profiles?fields=id,username,music_profile',
+        { credentials: 'same-origin' }
+      );
       if (!res.ok) return [];
       const data = await res.json();
-      const rows = data.users || [];
-      return rows.map((u) => ({
+      return (data.users || []).map((u) => ({
         id: u.id,
         username: u.username,
-        music_profile: u.music_profile || u.taste_profile
+        music_profile: u.music_profile
       }));
     } catch {
       return [];
@@ -0,0 +1,69 @@
+"""Brute-force coverage checks for the geohash helpers behind /api/nearby-concerts.
+
+Run from the repository root with `python -m pytest tests`.
+"""
+
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds its Supabase client at import time; the client is never used here.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-placeholder-key")
+
+import pytest  # noqa: E402
+
+import app as pulse  # noqa: E402
+
+
+def _destination(lat, lng, miles, bearing):
+    """Point miles away from (lat, lng) along bearing (radians), longitude wrapped to [-180, 180)."""
+    ad = miles / pulse.EARTH_RADIUS_MILES
+    la1, lo1 = math.radians(lat), math.radians(lng)
+    la2 = math.asin(math.sin(la1) * math.cos(ad) + math.cos(la1) * math.sin(ad) * math.cos(bearing))
+    lo2 = lo1 + math.atan2(math.sin(bearing) * math.sin(ad) * math.cos(la1),
+                           math.cos(ad) - math.sin(la1) * math.sin(la2))
+    return math.degrees(la2), (math.degrees(lo2) + 180) % 360 - 180
+
+
+def _assert_covers(lat, lng, radius, precision, rnd, samples=400):
+    cells = set(pulse.geohash_cells_within(lat, lng, radius, precision))
+    for _ in range(samples):
+        p_lat, p_lng = _destination(lat, lng, radius * math.sqrt(rnd.random()), rnd.uniform(0, 2 * math.pi))
+        if pulse.haversine_miles(lat, lng, p_lat, p_lng) > radius:
+            continue
+        cell = pulse.geohash_encode(p_lat, p_lng, precision)
+        assert cell in cells, f"{cell} holds ({p_lat:.4f}, {p_lng:.4f}) but is missing for ({lat}, {lng}, {radius}mi)"
+
+
+def test_cells_across_the_antimeridian():
+    cells = pulse.geohash_cells_within(69.474, 179.193, 100, 3)
+    assert {"bh6", "bh9"} <= set(cells)
+    _assert_covers(69.474, 179.193, 100, 3, random.Random(1), samples=2000)
+
+
+@pytest.mark.parametrize("lat", [89.99, 88.5, 85.0, -85.0, -88.5, -89.99])
+def test_cells_near_the_poles(lat):
+    rnd = random.Random(int(lat * 100))
+    for radius, precision in ((10, 4), (25, 3), (100, 3)):
+        _assert_covers(lat, rnd.uniform(-180, 180), radius, precision, rnd)
+
+
+def test_cells_random_points():
+    rnd = random.Random(7)
+    for _ in range(150):
+        lng = rnd.choice([rnd.uniform(-180, 180), rnd.uniform(178, 180), rnd.uniform(-180, -178)])
+        lat = rnd.choice([rnd.uniform(-80, 80), rnd.uniform(80, 89.99), rnd.uniform(-89.99, -80)])
+        radius, precision = rnd.choice([(10, 4), (25, 3), (50, 3), (100, 3)])
+        _assert_covers(lat, lng, radius, precision, rnd, samples=200)
+
+
+def test_cells_only_overlap_the_circle():
+    # Every returned cell has some point within the radius.
+    for cell in pulse.geohash_cells_within(34.05, -118.24, 25, 3):
+        nearest = pulse._nearest_point_in_cell(34.05, -118.24, pulse.geohash_bounds(cell))
+        assert pulse.haversine_miles(34.05, -118.24, *nearest) <= 25